@@ -1,19 +1,22 @@
-from dotenv import load_dotenv
-
-load_dotenv()
 from fastapi import HTTPException
+import hashlib
 import os
-from supabase import create_client, Client
 
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-from typing import Optional
+from collections import OrderedDict, deque
+from time import time
+from typing import Callable, Deque, Dict, NamedTuple, Optional
 import jwt
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 from passlib.context import CryptContext
 from pydantic import BaseModel
 
+from app.metrics import span
+from app.services import services
+
 # Use the same secret key for encoding and decoding JWT tokens
 SECRET_KEY = os.environ.get("SECRET_KEY")
 ALGORITHM = "HS256"
@@ -43,20 +46,131 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+class Principal(NamedTuple):
+    user_id: str
+    expires_at: float
+
+
+# Verified tokens, keyed by the SHA-256 of the raw token. Entries are dropped
+# once the token expires and the least recently used go first past the limit.
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 10000))
+_token_cache: "OrderedDict[str, Principal]" = OrderedDict()
+
+# Revocation hook: called with (token_hash, principal) and returns True if the
+# token must be rejected even though its signature is valid.
+_revoked_tokens: Dict[str, float] = {}
+revocation_check: Optional[Callable[[str, Principal], bool]] = None
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def revoke_token(token: str, expires_at: Optional[float] = None):
+    token_hash = _hash_token(token)
+    principal = _token_cache.pop(token_hash, None)
+    now = time()
+    if expires_at is None and principal is not None:
+        expires_at = principal.expires_at
+    if expires_at is None:
+        expires_at = now + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    for revoked, expiry in list(_revoked_tokens.items()):
+        if expiry <= now:
+            del _revoked_tokens[revoked]
+    _revoked_tokens[token_hash] = expires_at
+
+
+def _is_revoked(token_hash: str, principal: Principal) -> bool:
+    if token_hash in _revoked_tokens:
+        return True
+    return revocation_check is not None and revocation_check(token_hash, principal)
+
+
+def verify_token(token: str) -> Principal:
+    token_hash = _hash_token(token)
+    now = time()
+    principal = _token_cache.get(token_hash)
+    if principal is not None:
+        if principal.expires_at <= now:
+            del _token_cache[token_hash]
+            raise HTTPException(status_code=400, detail="Invalid token")
+        _token_cache.move_to_end(token_hash)
+    else:
+        try:
+            # Cached entries are bounded by the token's expiry, so it must have one.
+            payload = jwt.decode(
+                token,
+                SECRET_KEY,
+                algorithms=[ALGORITHM],
+                options={"require": ["exp"]},
+            )
+        except jwt.PyJWTError:
+            raise HTTPException(status_code=400, detail="Invalid token")
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=400, detail="User not found")
-        return user_id
-    except jwt.PyJWTError:
+        principal = Principal(user_id, float(payload["exp"]))
+        _token_cache[token_hash] = principal
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+
+    if _is_revoked(token_hash, principal):
         raise HTTPException(status_code=400, detail="Invalid token")
+    return principal
+
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
+    principal = verify_token(token)
+    request.state.principal = principal
+    return principal
+
+
+class AccountRateLimiter:
+    """Sliding-window limit on auth attempts per account (email).
+
+    Accounts are kept in least recently checked order, so stale ones and
+    any past `max_accounts` are dropped from the front without a scan.
+    """
+
+    def __init__(self, max_attempts: int, window: float, max_accounts: int = 10000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_accounts = max_accounts
+        self._attempts: "OrderedDict[str, Deque[float]]" = OrderedDict()
+
+    def check(self, account: str):
+        now = time()
+        key = account.strip().lower()
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            attempts = self._attempts[key] = deque()
+        else:
+            self._attempts.move_to_end(key)
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        if len(attempts) >= self.max_attempts:
+            raise HTTPException(
+                status_code=429, detail="Too many attempts, try again later"
+            )
+        attempts.append(now)
+        self._evict(now)
+
+    def _evict(self, now: float):
+        while len(self._attempts) > self.max_accounts:
+            self._attempts.popitem(last=False)
+        while self._attempts:
+            oldest = next(iter(self._attempts.values()))
+            if oldest and oldest[-1] > now - self.window:
+                break
+            self._attempts.popitem(last=False)
 
 
-url = os.environ.get("SUPABASE_URL")
-key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
+AUTH_RATE_LIMIT = int(os.environ.get("AUTH_RATE_LIMIT", 10))
+AUTH_RATE_WINDOW = float(os.environ.get("AUTH_RATE_WINDOW", 60))
+AUTH_RATE_MAX_ACCOUNTS = int(os.environ.get("AUTH_RATE_MAX_ACCOUNTS", 10000))
+auth_rate_limiter = AccountRateLimiter(
+    AUTH_RATE_LIMIT, AUTH_RATE_WINDOW, AUTH_RATE_MAX_ACCOUNTS
+)
 
 
 class AuthRequest(BaseModel):
@@ -66,10 +180,13 @@ class AuthRequest(BaseModel):
 
 
 async def signup(auth_request: AuthRequest):
+    auth_rate_limiter.check(auth_request.email)
     try:
-        user, error = supabase.auth.sign_up(
-            {"email": auth_request.email, "password": auth_request.password}
-        )
+        with span("supabase.auth.sign_up"):
+            user, error = await run_in_threadpool(
+                services.supabase.auth.sign_up,
+                {"email": auth_request.email, "password": auth_request.password},
+            )
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -81,10 +198,13 @@ async def signup(auth_request: AuthRequest):
 
 
 async def signin(auth_request: AuthRequest):
+    auth_rate_limiter.check(auth_request.email)
     try:
-        user, error = supabase.auth.sign_in_with_password(
-            {"email": auth_request.email, "password": auth_request.password}
-        )
+        with span("supabase.auth.sign_in_with_password"):
+            user, error = await run_in_threadpool(
+                services.supabase.auth.sign_in_with_password,
+                {"email": auth_request.email, "password": auth_request.password},
+            )
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -101,17 +221,18 @@ async def signin(auth_request: AuthRequest):
 
 async def create_user_in_users_table(user_id, email, username):
     try:
-        data, error = (
-            supabase.table("users")
-            .insert(
-                {
-                    "id": user_id,
-                    "email": email,
-                    "user_name": username,
-                }
+        with span("supabase.users.insert"):
+            data, error = await run_in_threadpool(
+                services.supabase.table("users")
+                .insert(
+                    {
+                        "id": user_id,
+                        "email": email,
+                        "user_name": username,
+                    }
+                )
+                .execute
             )
-            .execute()
-        )
 
     except Exception as e:
         print(f"Error inserting user into custom table: {e}")
@@ -120,7 +241,10 @@ async def create_user_in_users_table(user_id, email, username):
 
 
 async def get_user_by_email(email: str):
-    user = supabase.table("users").select("*").eq("email", email).execute()
+    with span("supabase.users.select"):
+        user = await run_in_threadpool(
+            services.supabase.table("users").select("*").eq("email", email).execute
+        )
     if user:
         return user[0]
     else:
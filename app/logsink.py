@@ -0,0 +1,157 @@
+import gzip
+import json
+import os
+import queue
+import random
+import threading
+from itertools import count
+from time import time
+
+from app.metrics import gpt3_log_dropped
+
+LOG_DIR = "gpt3_logs"
+
+# Fraction of completions that are recorded (1.0 keeps everything).
+SAMPLE_RATE = float(os.environ.get("GPT3_LOG_SAMPLE_RATE", 1.0))
+# Records waiting to be written; when full new records are dropped instead of
+# blocking the request.
+QUEUE_SIZE = int(os.environ.get("GPT3_LOG_QUEUE_SIZE", 10000))
+BATCH_SIZE = int(os.environ.get("GPT3_LOG_BATCH_SIZE", 200))
+FLUSH_INTERVAL = float(os.environ.get("GPT3_LOG_FLUSH_INTERVAL", 5.0))
+SEGMENT_BYTES = int(os.environ.get("GPT3_LOG_SEGMENT_BYTES", 16 * 1024 * 1024))
+MAX_SEGMENTS = int(os.environ.get("GPT3_LOG_MAX_SEGMENTS", 20))
+
+
+class CompletionLogSink:
+    """Batches completion records and writes them to rotating .jsonl.gz files.
+
+    `log` only enqueues, the file I/O happens on a background thread.
+    """
+
+    def __init__(
+        self,
+        directory=LOG_DIR,
+        sample_rate=SAMPLE_RATE,
+        queue_size=QUEUE_SIZE,
+        batch_size=BATCH_SIZE,
+        flush_interval=FLUSH_INTERVAL,
+        segment_bytes=SEGMENT_BYTES,
+        max_segments=MAX_SEGMENTS,
+    ):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._segment = None
+        self._segment_seq = count()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="gpt3-log-sink", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def log(self, record):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self.start()
+        record.setdefault("time", time())
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            gpt3_log_dropped.inc()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._write_batch(batch)
+        # Drain whatever is left so a clean shutdown loses nothing.
+        while True:
+            batch = self._take_batch(block=False)
+            if not batch:
+                break
+            self._write_batch(batch)
+
+    def _take_batch(self, block=True):
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            else:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        try:
+            lines = "".join(
+                json.dumps(record, ensure_ascii=False) + "\n" for record in batch
+            )
+            path = self._current_segment()
+            # Each batch is its own gzip member; concatenated members are a
+            # valid gzip stream, so segments can be appended to.
+            with open(path, "ab") as f:
+                f.write(gzip.compress(lines.encode("utf-8")))
+        except Exception as e:
+            print(f"Error writing gpt3 log batch: {e}")
+
+    def _current_segment(self):
+        if self._segment is not None:
+            try:
+                if os.path.getsize(self._segment) < self.segment_bytes:
+                    return self._segment
+            except FileNotFoundError:
+                return self._segment
+        os.makedirs(self.directory, exist_ok=True)
+        # The sequence number keeps names unique and ordered when several
+        # segments are opened within the same millisecond.
+        self._segment = os.path.join(
+            self.directory,
+            "completions-%d-%06d.jsonl.gz"
+            % (int(time() * 1000), next(self._segment_seq)),
+        )
+        self._prune_segments()
+        return self._segment
+
+    def _prune_segments(self):
+        segments = sorted(
+            name
+            for name in os.listdir(self.directory)
+            if name.startswith("completions-") and name.endswith(".jsonl.gz")
+        )
+        for name in segments[: max(len(segments) - self.max_segments + 1, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+completion_log = CompletionLogSink()
@@ -1,5 +1,5 @@
+import asyncio
 import random
-from dotenv import load_dotenv
 
 from fastapi import (
     Body,
@@ -11,56 +11,86 @@ from fastapi import (
     Request,
     UploadFile,
 )
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
 from typing import Dict, List, Optional
 import os
 import uuid
 import aiohttp
-import openai
 from time import time
-import pinecone
 
+from app.services import services
 from app.models import TextChat, TranscriptionData, UserData, UserWithAvatar
+from app.logsink import completion_log
+from app.response_cache import response_cache
+from app.metrics import MetricsMiddleware, render_metrics, span
+from app.tempfiles import request_audio_file, run_janitor
 from app.utils import (
-    delete_previous_files,
-    gpt3_completion,
+    cached_gpt3_completion,
     gpt3_embedding,
     load_conversation,
     open_file,
     timestamp_to_datetime,
 )
-
-load_dotenv()
-
-
-from app.auth import AuthRequest, get_current_user, signin, signup
+from app.auth import (
+    AuthRequest,
+    Principal,
+    get_current_user,
+    signin,
+    signup,
+)
 from app.schema import (
     UserCreate,
 )
 
-from supabase import create_client, Client
-
-
-url = os.environ.get("SUPABASE_URL")
-key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
-
 
 DEEPGRAM_API_KEY = os.environ.get("DEEPGRAM_API_KEY")
-openai.api_key = os.environ.get("OPEN_API_KEY")
-pinecone.init(
-    api_key=os.environ.get("PINECONE_API_KEY"),
-    environment=os.environ.get("PINECONE_ENVIRONMENT"),
-)
-vdb = pinecone.Index("spikin-database-index")
+DEEPGRAM_URL = os.environ.get("DEEPGRAM_URL", "https://api.deepgram.com/v1/listen")
 
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
 
 uploaded_files: Dict[str, str] = {}
 
 
+def start_warm_up():
+    # Build the clients off the event loop, retrying until they all succeed,
+    # so traffic is accepted right away; /ready turns green once it is done.
+    task = getattr(app.state, "warm_up", None)
+    if task is None or task.done():
+        app.state.warm_up = asyncio.ensure_future(services.warm_up_until_ready())
+
+
+@app.on_event("startup")
+async def warm_up_services():
+    app.state.warm_up = None
+    if os.environ.get("WARM_SERVICES", "true").lower() != "false":
+        start_warm_up()
+
+
+@app.on_event("startup")
+async def start_temp_file_janitor():
+    app.state.janitor = asyncio.ensure_future(run_janitor())
+
+
+@app.on_event("shutdown")
+async def stop_warm_up():
+    if app.state.warm_up is not None:
+        app.state.warm_up.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_temp_file_janitor():
+    app.state.janitor.cancel()
+
+
+@app.on_event("shutdown")
+async def flush_completion_log():
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, completion_log.stop)
+
+
 async def call_openai_chat_model(prompt: str):
-    response = openai.ChatCompletion.create(
+    response = services.openai.ChatCompletion.create(
         model="gpt-3.5-turbo",
         messages=[
             {"role": "system", "content": "You are a sarcastic assistant."},
@@ -77,7 +107,7 @@ async def call_openai_chat_model(prompt: str):
 async def transcribe_audio_with_deepgram(file_path: str):
     async with aiohttp.ClientSession() as session:
         async with session.post(
-            "https://api.deepgram.com/v1/listen",
+            DEEPGRAM_URL,
             headers={
                 "Authorization": f"Token {DEEPGRAM_API_KEY}",
                 "Content-Type": "application/octet-stream",
@@ -94,6 +124,30 @@ async def root():
     return {"message": "Welcome to the transcription API"}
 
 
+@app.get("/health")
+async def liveness():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def readiness():
+    if not services.is_ready():
+        # Covers WARM_SERVICES=false too: the first probe starts the build.
+        start_warm_up()
+        return JSONResponse(
+            status_code=503,
+            content={"status": "starting", "error": services.warm_error},
+        )
+    return {"status": "ready"}
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/favicon.ico")
 def read_favicon():
     return RedirectResponse(url="https://www.ionos.com/favicon.ico")
@@ -121,8 +175,8 @@ async def login_user(auth_request: AuthRequest):
 
 
 @app.get("/auth")
-async def auth_route(current_user_id: str = Depends(get_current_user)):
-    user = await get_user_by_id(current_user_id)
+async def auth_route(current_user: Principal = Depends(get_current_user)):
+    user = await get_user_by_id(current_user.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return {"user": user}
@@ -130,7 +184,8 @@ async def auth_route(current_user_id: str = Depends(get_current_user)):
 
 @app.get("/user/{user_id}")
 async def get_user_by_id(user_id: str):
-    user = supabase.table("users").select("*").eq("id", user_id).execute()
+    with span("supabase.users.select"):
+        user = services.supabase.table("users").select("*").eq("id", user_id).execute()
     if user:
         return user
     else:
@@ -140,14 +195,17 @@ async def get_user_by_id(user_id: str):
 @app.post("/user/update/")
 async def update_user(user_data: UserData):
     try:
-        response = (
-            supabase.table("users")
-            .update(user_data.dict(exclude_none=True))  # exclude None values
-            .eq("id", user_data.id)
-            .execute()
-        )
+        with span("supabase.users.update"):
+            response = (
+                services.supabase.table("users")
+                .update(user_data.dict(exclude_none=True))  # exclude None values
+                .eq("id", user_data.id)
+                .execute()
+            )
         if "error" in response:
             raise HTTPException(status_code=400, detail=response["error"])
+        # Cached replies were rendered with the old persona and interests.
+        response_cache.clear(user_data.id)
         return {
             "message": "User data updated successfully",
             "user_id": user_data.id,
@@ -161,24 +219,19 @@ async def update_user(user_data: UserData):
 async def upload_audio(
     audio: UploadFile = File(...), user_id: str = Body(...), topic: Optional[str] = None
 ):
-    file_id = str(uuid.uuid4())
-    file_location = f"audio_files/{file_id}.wav"
-    if not os.path.exists("audio_files"):
-        os.makedirs("audio_files")
-    delete_previous_files("audio_files")
-    delete_previous_files("gpt3_logs")
-    # Save the uploaded file
-    with open(file_location, "wb") as f:
-        f.write(audio.file.read())
-    # Transcribe the audio file using Deepgram API
-    transcription = await transcribe_audio_with_deepgram(file_location)
-    res = (
-        supabase.table("transcriptions")
-        .insert({"transcription": transcription, "user_id": user_id, "topic": topic})
-        .execute()
-    )
+    # Save the uploaded file and transcribe it using Deepgram API
+    with request_audio_file(audio) as (file_id, file_location):
+        with span("transcription"):
+            transcription = await transcribe_audio_with_deepgram(file_location)
+    with span("supabase.transcriptions.insert"):
+        res = (
+            services.supabase.table("transcriptions")
+            .insert(
+                {"transcription": transcription, "user_id": user_id, "topic": topic}
+            )
+            .execute()
+        )
 
-    print(res)
     if res.data:
         inserted_data = res.data[0]  # Fetch the first (and only) record inserted
         return {
@@ -196,12 +249,13 @@ async def update_topics(
     topic: str = data["topic"]
     try:
         for id in ids:
-            response = (
-                supabase.table("transcriptions")
-                .update({"topic": topic})
-                .eq("id", id)
-                .execute()
-            )
+            with span("supabase.transcriptions.update"):
+                response = (
+                    services.supabase.table("transcriptions")
+                    .update({"topic": topic})
+                    .eq("id", id)
+                    .execute()
+                )
             if "error" in response:
                 raise HTTPException(status_code=400, detail=response["error"])
         return {"message": "Topics updated successfully"}
@@ -212,15 +266,16 @@ async def update_topics(
 @app.get("/transcriptions_by_topic/")
 async def get_transcriptions(user_id: str, topic: str):
     try:
-        response = (
-            supabase.table("transcriptions")
-            .select(
-                "id, transcription, topic"
-            )  # select only id, transcription, and topic fields
-            .eq("user_id", user_id)
-            .eq("topic", topic)
-            .execute()
-        )
+        with span("supabase.transcriptions.select"):
+            response = (
+                services.supabase.table("transcriptions")
+                .select(
+                    "id, transcription, topic"
+                )  # select only id, transcription, and topic fields
+                .eq("user_id", user_id)
+                .eq("topic", topic)
+                .execute()
+            )
         if "error" in response:
             raise HTTPException(status_code=400, detail=response["error"])
 
@@ -236,12 +291,13 @@ async def get_transcriptions(user_id: str, topic: str):
 @app.get("/user_topics/")
 async def get_user_topics(user_id: str):
     try:
-        response = (
-            supabase.table("transcriptions")
-            .select("topic")
-            .eq("user_id", user_id)
-            .execute()
-        )
+        with span("supabase.transcriptions.select"):
+            response = (
+                services.supabase.table("transcriptions")
+                .select("topic")
+                .eq("user_id", user_id)
+                .execute()
+            )
         if "error" in response:
             raise HTTPException(status_code=400, detail=response["error"])
 
@@ -259,29 +315,25 @@ async def get_user_topics(user_id: str):
 @app.post("/test_upload/")
 async def test_upload(audio: UploadFile = File(...), user_id: str = Form(...)):
     # async def test_upload(audio_file: UploadFile = File(...)):
-    file_id = str(uuid.uuid4())
-    file_location = f"audio_files/{file_id}.wav"
-    if not os.path.exists("audio_files"):
-        os.makedirs("audio_files")
-
-    # Save the uploaded file
-    with open(file_location, "wb") as f:
-        f.write(audio.file.read())
-    # Transcribe the audio file using Deepgram API
-    transcription = await transcribe_audio_with_deepgram(file_location)
-
-    response = await call_openai_chat_model(transcription)
+    # Save the uploaded file and transcribe it using Deepgram API
+    with request_audio_file(audio) as (file_id, file_location):
+        with span("transcription"):
+            transcription = await transcribe_audio_with_deepgram(file_location)
+
+    with span("chat_completion"):
+        response = await call_openai_chat_model(transcription)
     ai_response = response["choices"][0]["message"]["content"]
     ai_response = ai_response.replace("\n", "")
     tokens_used = response["usage"]["total_tokens"]
-    supabase.table("transcriptions").insert(
-        {
-            "user_id": user_id,
-            "user_transcription": transcription,
-            "ai_response": ai_response,
-            "tokens_used": tokens_used,
-        }
-    ).execute()
+    with span("supabase.transcriptions.insert"):
+        services.supabase.table("transcriptions").insert(
+            {
+                "user_id": user_id,
+                "user_transcription": transcription,
+                "ai_response": ai_response,
+                "tokens_used": tokens_used,
+            }
+        ).execute()
 
     return {
         "file_id": file_id,
@@ -292,25 +344,27 @@ async def test_upload(audio: UploadFile = File(...), user_id: str = Form(...)):
 
 @app.get("/transcriptions")
 async def get_all_transcriptions():
-    transcriptions = supabase.table("transcriptions").select("*").execute()
+    with span("supabase.transcriptions.select"):
+        transcriptions = services.supabase.table("transcriptions").select("*").execute()
     return transcriptions
 
 
 @app.get("/users")
 async def get_all_users():
-    users = supabase.table("users").select("*").execute()
+    with span("supabase.users.select"):
+        users = services.supabase.table("users").select("*").execute()
     return users
 
 
 @app.get("/transcription/{transcription_id}")
 async def get_transcription_by_id(transcription_id: str):
-    print(transcription_id)
-    transcription = (
-        supabase.table("transcriptions")
-        .select("*")
-        .eq("id", transcription_id)
-        .execute()
-    )
+    with span("supabase.transcriptions.select"):
+        transcription = (
+            services.supabase.table("transcriptions")
+            .select("*")
+            .eq("id", transcription_id)
+            .execute()
+        )
 
     if transcription:
         return transcription
@@ -320,9 +374,13 @@ async def get_transcription_by_id(transcription_id: str):
 
 @app.get("/transcriptions/user/{user_id}")
 async def get_transcriptions_by_user_id(user_id: str):
-    transcriptions = (
-        supabase.table("transcriptions").select("*").eq("user_id", user_id).execute()
-    )
+    with span("supabase.transcriptions.select"):
+        transcriptions = (
+            services.supabase.table("transcriptions")
+            .select("*")
+            .eq("user_id", user_id)
+            .execute()
+        )
     if transcriptions:
         return transcriptions
     else:
@@ -338,18 +396,10 @@ convo_length = 5
 async def pinecone_chat(
     audio: UploadFile = File(...), user_id: str = Body(...), user_name: str = Body(...)
 ):
-    file_id = str(uuid.uuid4())
-    file_location = f"audio_files/{file_id}.wav"
-    if not os.path.exists("audio_files"):
-        os.makedirs("audio_files")
-    delete_previous_files("audio_files")
-    delete_previous_files("gpt3_logs")
-
-    # Save the uploaded file
-    with open(file_location, "wb") as f:
-        f.write(audio.file.read())
+    with request_audio_file(audio) as (file_id, file_location):
+        with span("transcription"):
+            transcription = await transcribe_audio_with_deepgram(file_location)
     payload = list()
-    transcription = await transcribe_audio_with_deepgram(file_location)
     timestamp = time()
     timestring = timestamp_to_datetime(timestamp)
     a = "\n\n%s: " % user_name + transcription
@@ -365,30 +415,33 @@ async def pinecone_chat(
         "uuid": unique_id,
         "user_id": user_id,
     }
-    supabase.table("messages_metadata").insert(
-        {
-            "message": metadata["message"],
-            "timestring": metadata["timestring"],
-            "uuid": metadata["uuid"],
-            "speaker": metadata["speaker"],
-            "user_id": metadata["user_id"],
-        }
-    ).execute()
-    topic_chars = (
-        supabase.table("users")
-        .select("interests", "ai_role", "assistant_name")
-        .eq("id", user_id)
-        .execute()
-    )
-    print(topic_chars)
+    with span("supabase.messages_metadata.insert"):
+        services.supabase.table("messages_metadata").insert(
+            {
+                "message": metadata["message"],
+                "timestring": metadata["timestring"],
+                "uuid": metadata["uuid"],
+                "speaker": metadata["speaker"],
+                "user_id": metadata["user_id"],
+            }
+        ).execute()
+    with span("supabase.users.select"):
+        topic_chars = (
+            services.supabase.table("users")
+            .select("interests", "ai_role", "assistant_name")
+            .eq("id", user_id)
+            .execute()
+        )
     for user in topic_chars.data:
         interests = user["interests"]
         ai_role = user["ai_role"]
         assistant_name = user["assistant_name"]
 
     payload.append((unique_id, vector))
-    results = vdb.query(vector=vector, top_k=convo_length)
-    conversation = load_conversation(results)
+    with span("vector_query"):
+        results = services.vdb.query(vector=vector, top_k=convo_length)
+    with span("load_conversation"):
+        conversation = load_conversation(results)
     prompt = (
         open_file("prompt_response.txt")
         .replace("<<CONVERSATION>>", conversation)
@@ -399,7 +452,9 @@ async def pinecone_chat(
         .replace("<<topic>>", random.choice(interests))
     )
 
-    output = gpt3_completion(prompt)
+    output = cached_gpt3_completion(
+        prompt, (user_id, assistant_name, ai_role), vector
+    )
     timestamp = time()
     timestring = timestamp_to_datetime(timestamp)
     message = output
@@ -413,17 +468,19 @@ async def pinecone_chat(
         "uuid": unique_id,
         "user_id": metadata["user_id"],
     }
-    supabase.table("messages_metadata").insert(
-        {
-            "message": metadata["message"],
-            "timestring": metadata["timestring"],
-            "uuid": metadata["uuid"],
-            "speaker": metadata["speaker"],
-            "user_id": metadata["user_id"],
-        }
-    ).execute()
+    with span("supabase.messages_metadata.insert"):
+        services.supabase.table("messages_metadata").insert(
+            {
+                "message": metadata["message"],
+                "timestring": metadata["timestring"],
+                "uuid": metadata["uuid"],
+                "speaker": metadata["speaker"],
+                "user_id": metadata["user_id"],
+            }
+        ).execute()
     payload.append((unique_id, vector))
-    vdb.upsert(payload)
+    with span("vector_upsert"):
+        services.vdb.upsert(payload)
     return {
         "output": output,
         "prompt": prompt,
@@ -434,8 +491,6 @@ async def pinecone_chat(
 
 @app.post("/text_chat/")
 async def text_chat(chat: TextChat):
-    delete_previous_files("gpt3_logs")
-
     payload = list()
     timestamp = time()
     timestring = timestamp_to_datetime(timestamp)
@@ -450,30 +505,34 @@ async def text_chat(chat: TextChat):
         "uuid": unique_id,
         "user_id": chat.user_id,
     }
-    supabase.table("messages_metadata").insert(
-        {
-            "message": metadata["message"],
-            "timestring": metadata["timestring"],
-            "uuid": metadata["uuid"],
-            "speaker": metadata["speaker"],
-            "user_id": metadata["user_id"],
-        }
-    ).execute()
-
-    topic_chars = (
-        supabase.table("users")
-        .select("interests", "ai_role", "assistant_name")
-        .eq("id", chat.user_id)
-        .execute()
-    )
+    with span("supabase.messages_metadata.insert"):
+        services.supabase.table("messages_metadata").insert(
+            {
+                "message": metadata["message"],
+                "timestring": metadata["timestring"],
+                "uuid": metadata["uuid"],
+                "speaker": metadata["speaker"],
+                "user_id": metadata["user_id"],
+            }
+        ).execute()
+
+    with span("supabase.users.select"):
+        topic_chars = (
+            services.supabase.table("users")
+            .select("interests", "ai_role", "assistant_name")
+            .eq("id", chat.user_id)
+            .execute()
+        )
     for user in topic_chars.data:
         interests = user["interests"]
         ai_role = user["ai_role"]
         assistant_name = user["assistant_name"]
 
     payload.append((unique_id, vector))
-    results = vdb.query(vector=vector, top_k=convo_length)
-    conversation = load_conversation(results)
+    with span("vector_query"):
+        results = services.vdb.query(vector=vector, top_k=convo_length)
+    with span("load_conversation"):
+        conversation = load_conversation(results)
     prompt = (
         open_file("prompt_response.txt")
         .replace("<<CONVERSATION>>", conversation)
@@ -484,7 +543,9 @@ async def text_chat(chat: TextChat):
         .replace("<<topic>>", random.choice(interests))
     )
 
-    output = gpt3_completion(prompt)
+    output = cached_gpt3_completion(
+        prompt, (chat.user_id, assistant_name, ai_role), vector
+    )
     timestamp = time()
     timestring = timestamp_to_datetime(timestamp)
     # message = '%s: %s - %s' % ('RAVEN', timestring, output)
@@ -499,15 +560,17 @@ async def text_chat(chat: TextChat):
         "uuid": unique_id,
         "user_id": metadata["user_id"],
     }
-    supabase.table("messages_metadata").insert(
-        {
-            "message": metadata["message"],
-            "timestring": metadata["timestring"],
-            "uuid": metadata["uuid"],
-            "speaker": metadata["speaker"],
-            "user_id": metadata["user_id"],
-        }
-    ).execute()
+    with span("supabase.messages_metadata.insert"):
+        services.supabase.table("messages_metadata").insert(
+            {
+                "message": metadata["message"],
+                "timestring": metadata["timestring"],
+                "uuid": metadata["uuid"],
+                "speaker": metadata["speaker"],
+                "user_id": metadata["user_id"],
+            }
+        ).execute()
     payload.append((unique_id, vector))
-    vdb.upsert(payload)
+    with span("vector_upsert"):
+        services.vdb.upsert(payload)
     return {"output": output, "prompt": prompt, "topic_chars": topic_chars}
@@ -0,0 +1,205 @@
+import os
+import random
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Tuple
+
+from starlette.routing import Match
+
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() != "false"
+# OpenTelemetry spans are only exported when OTEL_TRACING is on and the
+# opentelemetry-api package is installed; OTEL_SAMPLE_RATE thins them out.
+OTEL_TRACING = os.environ.get("OTEL_TRACING", "false").lower() == "true"
+OTEL_SAMPLE_RATE = float(os.environ.get("OTEL_SAMPLE_RATE", 1.0))
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+_tracer = None
+if OTEL_TRACING:
+    try:
+        from opentelemetry import trace
+
+        _tracer = trace.get_tracer("api-transcription")
+    except ImportError:
+        print("OTEL_TRACING is set but opentelemetry is not installed")
+
+
+class Histogram:
+    """Prometheus-style histogram with one series per label tuple."""
+
+    def __init__(self, name, help, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            base = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.labelnames, labels)
+            )
+            prefix = base + "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += values[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {values[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """Prometheus-style counter without labels."""
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def render(self):
+        return "\n".join(
+            [
+                f"# HELP {self.name} {self.help}",
+                f"# TYPE {self.name} counter",
+                f"{self.name} {self._value}",
+            ]
+        )
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+stage_duration = Histogram(
+    "stage_duration_seconds",
+    "Latency of each stage of the request pipeline",
+    ("stage", "outcome"),
+)
+gpt3_log_dropped = Counter(
+    "gpt3_log_dropped_total",
+    "Completion log records dropped because the sink queue was full",
+)
+REGISTRY = [http_request_duration, stage_duration, gpt3_log_dropped]
+
+
+def render_metrics():
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+@contextmanager
+def _no_span():
+    yield
+
+
+@contextmanager
+def _timed_span(stage):
+    otel_span = None
+    if _tracer is not None and random.random() < OTEL_SAMPLE_RATE:
+        otel_span = _tracer.start_as_current_span(stage)
+        otel_span.__enter__()
+    outcome = "ok"
+    start = perf_counter()
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        stage_duration.observe(perf_counter() - start, stage, outcome)
+        if otel_span is not None:
+            otel_span.__exit__(None, None, None)
+
+
+def span(stage):
+    """Time a block as one pipeline stage, e.g. `with span("embedding"):`."""
+    if not METRICS_ENABLED:
+        return _no_span()
+    return _timed_span(stage)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(
+                perf_counter() - start,
+                scope["method"],
+                _route_template(scope),
+                str(status["code"]),
+            )
+
+
+def _route_template(scope):
+    # Label by route path, not the raw URL, to keep the series count bounded.
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for route in getattr(router, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import math
+import os
+from array import array
+from collections import OrderedDict
+from time import time
+from typing import Dict, Hashable, NamedTuple, Optional, Sequence, Tuple
+
+
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 60 * 60))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 5000))
+# Cosine similarity above which a message counts as a near duplicate of a
+# cached one; 0 turns the near-duplicate mode off.
+RESPONSE_CACHE_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", 0))
+# Embeddings kept for the near-duplicate mode, in total and per scope. Each
+# one is an ada-002 vector of 1536 float32, about 6 KB.
+RESPONSE_CACHE_SIMILAR_SIZE = int(
+    os.environ.get("RESPONSE_CACHE_SIMILAR_SIZE", 2000)
+)
+RESPONSE_CACHE_PER_USER = int(os.environ.get("RESPONSE_CACHE_PER_USER", 50))
+
+
+class CachedResponse(NamedTuple):
+    response: str
+    expires_at: float
+
+
+class SimilarEntry(NamedTuple):
+    scope: Hashable
+    vector: array
+    norm: float
+    response: str
+    expires_at: float
+
+
+def prompt_key(prompt: str, params: dict) -> str:
+    payload = json.dumps(params, sort_keys=True, default=str) + "\n" + prompt
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _norm(vector):
+    return math.sqrt(sum(x * x for x in vector))
+
+
+def _user_of(scope):
+    return scope[0] if isinstance(scope, tuple) else scope
+
+
+class ResponseCache:
+    """Cache of completions, partitioned by scope.
+
+    A scope is the user id, or a tuple starting with it (e.g. the user id
+    plus the persona fields), so one user's answers never leak to another
+    and a persona change starts from an empty partition.
+
+    Exact hits are keyed by the hash of the rendered prompt and the model
+    params. With a similarity threshold set, a miss falls back to comparing
+    the message embedding against the scope's recent cached messages.
+    Entries expire after `ttl` seconds and the least recently used are
+    evicted past `max_size` prompts or `max_similar` embeddings.
+    """
+
+    def __init__(
+        self,
+        ttl=RESPONSE_CACHE_TTL,
+        max_size=RESPONSE_CACHE_SIZE,
+        similarity=RESPONSE_CACHE_SIMILARITY,
+        max_similar=RESPONSE_CACHE_SIMILAR_SIZE,
+        max_per_user=RESPONSE_CACHE_PER_USER,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.similarity = similarity
+        self.max_similar = max_similar
+        self.max_per_user = max_per_user
+        self.hits = 0
+        self.misses = 0
+        self._exact: "OrderedDict[Tuple[Hashable, str], CachedResponse]" = (
+            OrderedDict()
+        )
+        # All embeddings in LRU order, plus each scope's ids in insertion order.
+        self._similar: "OrderedDict[int, SimilarEntry]" = OrderedDict()
+        self._by_scope: Dict[Hashable, "OrderedDict[int, None]"] = {}
+        self._next_id = 0
+
+    @property
+    def _similarity_enabled(self):
+        return (
+            self.similarity > 0 and self.max_similar > 0 and self.max_per_user > 0
+        )
+
+    def get(
+        self,
+        scope: Hashable,
+        prompt: str,
+        params: dict,
+        vector: Optional[Sequence[float]] = None,
+    ) -> Optional[str]:
+        now = time()
+        key = (scope, prompt_key(prompt, params))
+        entry = self._exact.get(key)
+        if entry is not None:
+            if entry.expires_at > now:
+                self._exact.move_to_end(key)
+                self.hits += 1
+                return entry.response
+            del self._exact[key]
+
+        if self._similarity_enabled and vector is not None:
+            response = self._get_similar(scope, vector, now)
+            if response is not None:
+                self.hits += 1
+                return response
+
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        scope: Hashable,
+        prompt: str,
+        params: dict,
+        response: str,
+        vector: Optional[Sequence[float]] = None,
+    ):
+        expires_at = time() + self.ttl
+        key = (scope, prompt_key(prompt, params))
+        self._exact[key] = CachedResponse(response, expires_at)
+        self._exact.move_to_end(key)
+        while len(self._exact) > self.max_size:
+            self._exact.popitem(last=False)
+
+        if self._similarity_enabled and vector is not None:
+            compact = array("f", vector)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._similar[entry_id] = SimilarEntry(
+                scope, compact, _norm(compact), response, expires_at
+            )
+            ids = self._by_scope.setdefault(scope, OrderedDict())
+            ids[entry_id] = None
+            while len(ids) > self.max_per_user:
+                self._evict(next(iter(ids)))
+            while len(self._similar) > self.max_similar:
+                self._evict(next(iter(self._similar)))
+
+    def _evict(self, entry_id):
+        entry = self._similar.pop(entry_id)
+        ids = self._by_scope[entry.scope]
+        del ids[entry_id]
+        if not ids:
+            del self._by_scope[entry.scope]
+
+    def _get_similar(self, scope, vector, now):
+        ids = self._by_scope.get(scope)
+        if not ids:
+            return None
+        norm = _norm(vector)
+        if not norm:
+            return None
+        best_id, best_score = None, self.similarity
+        for entry_id in list(ids):
+            entry = self._similar[entry_id]
+            if entry.expires_at <= now:
+                self._evict(entry_id)
+                continue
+            if not entry.norm:
+                continue
+            score = sum(a * b for a, b in zip(vector, entry.vector)) / (
+                norm * entry.norm
+            )
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+        if best_id is None:
+            return None
+        self._similar.move_to_end(best_id)
+        return self._similar[best_id].response
+
+    def clear(self, user_id: Optional[str] = None):
+        if user_id is None:
+            self._exact.clear()
+            self._similar.clear()
+            self._by_scope.clear()
+            return
+        for key in [key for key in self._exact if _user_of(key[0]) == user_id]:
+            del self._exact[key]
+        scopes = [scope for scope in self._by_scope if _user_of(scope) == user_id]
+        for scope in scopes:
+            for entry_id in list(self._by_scope[scope]):
+                self._evict(entry_id)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+PINECONE_INDEX = "spikin-database-index"
+# Longest pause between warm-up attempts while a client keeps failing.
+WARM_UP_MAX_DELAY = float(os.environ.get("WARM_UP_MAX_DELAY", 60))
+
+
+class Services:
+    """Holds the external clients and builds each one on first use.
+
+    Importing the app does no network I/O and needs no credentials; the
+    startup hook calls `warm_up` in the background so the first request
+    does not pay for it, and `/ready` reports when that has finished.
+
+    Each client has its own lock, so a slow Pinecone init does not hold up
+    Supabase. A client that is first touched from a coroutine before
+    warm-up has built it is built right there and blocks the event loop
+    until it is ready.
+    """
+
+    def __init__(self):
+        self._supabase_lock = threading.Lock()
+        self._vdb_lock = threading.Lock()
+        self._openai_lock = threading.Lock()
+        self._supabase = None
+        self._vdb = None
+        self._openai = None
+        self.warm_error = None
+
+    @property
+    def supabase(self):
+        if self._supabase is None:
+            with self._supabase_lock:
+                if self._supabase is None:
+                    from supabase import create_client
+
+                    self._supabase = create_client(
+                        os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+                    )
+        return self._supabase
+
+    @supabase.setter
+    def supabase(self, client):
+        self._supabase = client
+
+    @property
+    def vdb(self):
+        if self._vdb is None:
+            with self._vdb_lock:
+                if self._vdb is None:
+                    import pinecone
+
+                    pinecone.init(
+                        api_key=os.environ.get("PINECONE_API_KEY"),
+                        environment=os.environ.get("PINECONE_ENVIRONMENT"),
+                    )
+                    self._vdb = pinecone.Index(PINECONE_INDEX)
+        return self._vdb
+
+    @vdb.setter
+    def vdb(self, index):
+        self._vdb = index
+
+    @property
+    def openai(self):
+        if self._openai is None:
+            with self._openai_lock:
+                if self._openai is None:
+                    import openai
+
+                    openai.api_key = os.environ.get("OPEN_API_KEY")
+                    self._openai = openai
+        return self._openai
+
+    @openai.setter
+    def openai(self, module):
+        self._openai = module
+
+    def warm_up(self):
+        try:
+            self.supabase
+            self.vdb
+            self.openai
+            self.warm_error = None
+        except Exception as e:
+            self.warm_error = str(e)
+            print(f"Error building service clients: {e}")
+        return self.is_ready()
+
+    async def warm_up_until_ready(self, delay=1.0, max_delay=WARM_UP_MAX_DELAY):
+        """Run `warm_up` off the event loop, backing off until it succeeds."""
+        loop = asyncio.get_event_loop()
+        while not await loop.run_in_executor(None, self.warm_up):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+    def is_ready(self):
+        return (
+            self._supabase is not None
+            and self._vdb is not None
+            and self._openai is not None
+        )
+
+
+services = Services()
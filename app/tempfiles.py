@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from time import time
+
+from fastapi import UploadFile
+
+
+AUDIO_DIR = "audio_files"
+TEMP_DIRS = [AUDIO_DIR]
+
+# Janitor quotas: files older than MAX_FILE_AGE seconds are removed, and if a
+# directory is still above MAX_DIR_BYTES the oldest files go first.
+MAX_FILE_AGE = int(os.environ.get("TEMP_MAX_FILE_AGE", 60 * 60))
+MAX_DIR_BYTES = int(os.environ.get("TEMP_MAX_DIR_BYTES", 512 * 1024 * 1024))
+JANITOR_INTERVAL = int(os.environ.get("TEMP_JANITOR_INTERVAL", 5 * 60))
+
+CHUNK_SIZE = 1024 * 1024
+
+# Files owned by requests still in progress; the janitor never touches them.
+_live_paths = set()
+_live_lock = threading.Lock()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def request_audio_file(audio: UploadFile, suffix=".wav"):
+    """Save an uploaded file under a unique name and remove it on exit.
+
+    Each request owns exactly one file, so concurrent uploads never touch
+    each other's audio.
+    """
+    os.makedirs(AUDIO_DIR, exist_ok=True)
+    file_id = str(uuid.uuid4())
+    file_location = os.path.join(AUDIO_DIR, f"{file_id}{suffix}")
+    live_path = os.path.abspath(file_location)
+    with _live_lock:
+        _live_paths.add(live_path)
+    try:
+        with open(file_location, "wb") as f:
+            while True:
+                chunk = audio.file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+        yield file_id, file_location
+    finally:
+        _remove(file_location)
+        with _live_lock:
+            _live_paths.discard(live_path)
+
+
+def _remove_if_idle(path):
+    # Checked under the lock so a request cannot claim the path in between.
+    with _live_lock:
+        if os.path.abspath(path) in _live_paths:
+            return 0
+        _remove(path)
+    return 1
+
+
+def sweep_directory(directory, max_age=MAX_FILE_AGE, max_bytes=MAX_DIR_BYTES):
+    """Enforce the age and size quotas on one directory.
+
+    Files of requests still in progress are skipped. Returns the number of
+    files removed.
+    """
+    if not os.path.isdir(directory):
+        return 0
+    now = time()
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    removed = 0
+    kept = []
+    for mtime, size, path in entries:
+        if now - mtime > max_age:
+            removed += _remove_if_idle(path)
+        else:
+            kept.append((mtime, size, path))
+
+    total = sum(size for _, size, _ in kept)
+    if total > max_bytes:
+        kept.sort()
+        for mtime, size, path in kept:
+            if total <= max_bytes:
+                break
+            if _remove_if_idle(path):
+                total -= size
+                removed += 1
+    return removed
+
+
+def sweep_temp_dirs():
+    return sum(sweep_directory(directory) for directory in TEMP_DIRS)
+
+
+async def run_janitor(interval=JANITOR_INTERVAL):
+    loop = asyncio.get_event_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, sweep_temp_dirs)
+        except Exception as e:
+            print(f"Error sweeping temp files: {e}")
+        await asyncio.sleep(interval)
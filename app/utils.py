@@ -1,26 +1,12 @@
 import re
-from dotenv import load_dotenv
-import openai
 import datetime
-import glob
-from time import time, sleep
+import inspect
+from time import sleep
 
-load_dotenv()
-from supabase import create_client, Client
-
-import os
-
-
-url = os.environ.get("SUPABASE_URL")
-key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
-openai.api_key = os.environ.get("OPEN_API_KEY")
-
-
-def delete_previous_files(directory):
-    files = glob.glob(f"{directory}/*")
-    for file in files:
-        os.remove(file)
+from app.logsink import completion_log
+from app.metrics import span
+from app.response_cache import response_cache
+from app.services import services
 
 
 def open_file(filepath):
@@ -32,7 +18,8 @@ def gpt3_embedding(content, engine="text-embedding-ada-002"):
     content = content.encode(
         encoding="ASCII", errors="ignore"
     ).decode()  # fix any UNICODE errors
-    response = openai.Embedding.create(input=content, engine=engine)
+    with span("embedding"):
+        response = services.openai.Embedding.create(input=content, engine=engine)
     vector = response["data"][0]["embedding"]  # this is a normal list
     return vector
 
@@ -45,18 +32,18 @@ def timestamp_to_datetime(unix_time):
 
 def load_conversation(results):
     ids = [m.get("id") for m in results["matches"] if "id" in m]
-    print(ids)
     if ids:
         ids_string = ",".join(
             ids
         )  # Convert the list of UUIDs to a comma-separated string
-        response = (
-            supabase.table("messages_metadata")
-            .select("message, timestring")
-            .filter("uuid", "in", f"({ids_string})")  # Pass the UUIDs as a string
-            .order("timestring")
-            .execute()
-        )
+        with span("supabase.messages_metadata.select"):
+            response = (
+                services.supabase.table("messages_metadata")
+                .select("message, timestring")
+                .filter("uuid", "in", f"({ids_string})")  # Pass the UUIDs as a string
+                .order("timestring")
+                .execute()
+            )
         rows = response.data if response.data else []
         ordered_messages = [row["message"] for row in rows]
         return "\n".join(ordered_messages).strip()
@@ -64,11 +51,6 @@ def load_conversation(results):
     return "no hay ids"
 
 
-def save_file(filepath, content):
-    with open(filepath, "w", encoding="utf-8") as outfile:
-        outfile.write(content)
-
-
 def gpt3_completion(
     prompt,
     engine="text-davinci-003",
@@ -84,24 +66,28 @@ def gpt3_completion(
     prompt = prompt.encode(encoding="ASCII", errors="ignore").decode()
     while True:
         try:
-            response = openai.Completion.create(
-                engine=engine,
-                prompt=prompt,
-                temperature=temp,
-                max_tokens=tokens,
-                top_p=top_p,
-                frequency_penalty=freq_pen,
-                presence_penalty=pres_pen,
-                stop=stop,
-            )
+            with span("completion"):
+                response = services.openai.Completion.create(
+                    engine=engine,
+                    prompt=prompt,
+                    temperature=temp,
+                    max_tokens=tokens,
+                    top_p=top_p,
+                    frequency_penalty=freq_pen,
+                    presence_penalty=pres_pen,
+                    stop=stop,
+                )
             text = response["choices"][0]["text"].strip()
             text = re.sub("[\r\n]+", "\n", text)
             text = re.sub("[\t ]+", " ", text)
-            filename = "%s_gpt3.txt" % time()
-            if not os.path.exists("gpt3_logs"):
-                os.makedirs("gpt3_logs")
-            save_file("gpt3_logs/%s" % filename, prompt + "\n\n==========\n\n" + text)
-            print(text)
+            completion_log.log(
+                {
+                    "engine": engine,
+                    "temperature": temp,
+                    "prompt": prompt,
+                    "completion": text,
+                }
+            )
             return text
         except Exception as oops:
             retry += 1
@@ -109,3 +95,23 @@ def gpt3_completion(
                 return "GPT3 error: %s" % oops
             print("Error communicating with OpenAI:", oops)
             sleep(1)
+
+
+def cached_gpt3_completion(prompt, scope, vector=None, **kwargs):
+    # Key on the model params gpt3_completion will actually use, defaults
+    # included, so changing any of them never serves a stale answer.
+    bound = inspect.signature(gpt3_completion).bind(prompt, **kwargs)
+    bound.apply_defaults()
+    params = dict(bound.arguments)
+    del params["prompt"]
+    # Only deterministic completions are worth reusing.
+    if params["temp"] != 0.0:
+        return gpt3_completion(prompt, **kwargs)
+    with span("response_cache"):
+        output = response_cache.get(scope, prompt, params, vector)
+    if output is not None:
+        return output
+    output = gpt3_completion(prompt, **kwargs)
+    if not output.startswith("GPT3 error"):
+        response_cache.put(scope, prompt, params, output, vector)
+    return output
@@ -0,0 +1,51 @@
+"""Micro-benchmark for the get_current_user auth dependency.
+
+Run from the repo root:
+
+    python -m bench.auth_bench
+"""
+import asyncio
+import os
+import timeit
+from datetime import timedelta
+
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+import jwt
+from starlette.requests import Request
+
+from app import auth
+
+
+N = 20000
+
+
+def _request():
+    return Request({"type": "http", "headers": [], "state": {}})
+
+
+def main():
+    token = auth.create_access_token({"sub": "bench-user"}, timedelta(hours=1))
+    loop = asyncio.get_event_loop()
+
+    def full_decode():
+        jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+
+    def cached_verify():
+        auth.verify_token(token)
+
+    def dependency():
+        loop.run_until_complete(auth.get_current_user(_request(), token))
+
+    auth.verify_token(token)
+    for name, fn in [
+        ("jwt.decode", full_decode),
+        ("verify_token (cached)", cached_verify),
+        ("get_current_user (cached)", dependency),
+    ]:
+        seconds = min(timeit.repeat(fn, number=N, repeat=3))
+        print(f"{name:28} {seconds / N * 1e6:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""In-process stand-ins for Deepgram, OpenAI, Pinecone and Supabase.
+
+Each fake sleeps for a configurable latency and fails with a configurable
+probability. The OpenAI, Pinecone and Supabase clients are synchronous, so
+their fakes block with time.sleep exactly like the real ones do; Deepgram is
+called over HTTP, so its fake is a local aiohttp server.
+"""
+import asyncio
+import random
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, List, Optional
+
+from aiohttp import web
+from pydantic import BaseModel
+
+
+class FakeServiceError(Exception):
+    pass
+
+
+class Behaviour:
+    def __init__(self, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+
+    def delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise FakeServiceError("simulated failure")
+
+    async def async_delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return bool(self.error_rate and random.random() < self.error_rate)
+
+
+# Supabase
+
+
+class FakeResponse(BaseModel):
+    # Same shape as postgrest's APIResponse, so endpoints can serialize it and
+    # `"error" in response` behaves the same way.
+    data: List[Any]
+    count: Optional[int] = None
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.values = None
+        self.filters = []
+        self.order_by = None
+
+    def select(self, *columns):
+        self.action = "select"
+        return self
+
+    def insert(self, values):
+        self.action = "insert"
+        self.values = values
+        return self
+
+    def update(self, values):
+        self.action = "update"
+        self.values = values
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def filter(self, column, operator, value):
+        if operator == "in":
+            allowed = set(value.strip("()").split(","))
+            self.filters.append(lambda row: str(row.get(column)) in allowed)
+        elif operator == "eq":
+            self.eq(column, value)
+        return self
+
+    def order(self, column):
+        self.order_by = column
+        return self
+
+    def execute(self):
+        self.db.behaviour.delay()
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.action == "insert":
+            row = {"id": str(uuid.uuid4()), **self.values}
+            rows.append(row)
+            return FakeResponse(data=[row])
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.action == "update":
+            for row in matched:
+                row.update(self.values)
+        if self.order_by:
+            matched.sort(key=lambda row: str(row.get(self.order_by)))
+        return FakeResponse(data=matched)
+
+
+class FakeAuth:
+    def __init__(self, db):
+        self.db = db
+
+    def _user(self, credentials):
+        self.db.behaviour.delay()
+        user_id = uuid.uuid5(uuid.NAMESPACE_URL, credentials["email"])
+        user = SimpleNamespace(id=str(user_id))
+        return ("user", user), None
+
+    def sign_up(self, credentials):
+        return self._user(credentials)
+
+    def sign_in_with_password(self, credentials):
+        return self._user(credentials)
+
+
+class FakeSupabase:
+    def __init__(self, behaviour: Behaviour):
+        self.behaviour = behaviour
+        self.tables = {}
+        self.auth = FakeAuth(self)
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def seed_user(self, user_id):
+        self.tables.setdefault("users", []).append(
+            {
+                "id": user_id,
+                "email": f"{user_id}@example.com",
+                "user_name": "bench",
+                "interests": ["travel", "music", "food"],
+                "ai_role": "english teacher",
+                "assistant_name": "Diomedes",
+            }
+        )
+        self.tables.setdefault("transcriptions", []).extend(
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "transcription": f"sample transcription {i}",
+                "topic": "travel" if i % 2 else "music",
+            }
+            for i in range(20)
+        )
+
+
+# OpenAI
+
+
+class FakeOpenAI:
+    def __init__(self, embedding: Behaviour, completion: Behaviour, dimensions=1536):
+        owner = self
+        self.dimensions = dimensions
+
+        class Embedding:
+            @staticmethod
+            def create(input, engine):
+                embedding.delay()
+                rng = random.Random(hash(input))
+                vector = [rng.random() for _ in range(owner.dimensions)]
+                return {"data": [{"embedding": vector}]}
+
+        class Completion:
+            @staticmethod
+            def create(prompt, **kwargs):
+                completion.delay()
+                return {"choices": [{"text": "That is a fine sentence. What next?"}]}
+
+        class ChatCompletion:
+            @staticmethod
+            def create(messages, **kwargs):
+                completion.delay()
+                return {
+                    "choices": [{"message": {"content": "Sure, whatever you say."}}],
+                    "usage": {"total_tokens": 42},
+                }
+
+        self.Embedding = Embedding
+        self.Completion = Completion
+        self.ChatCompletion = ChatCompletion
+
+
+# Pinecone
+
+
+class FakeIndex:
+    def __init__(self, behaviour: Behaviour):
+        self.behaviour = behaviour
+        self.ids = []
+
+    def query(self, vector, top_k):
+        self.behaviour.delay()
+        return {"matches": [{"id": id, "score": 0.9} for id in self.ids[-top_k:]]}
+
+    def upsert(self, vectors):
+        self.behaviour.delay()
+        self.ids.extend(id for id, _ in vectors)
+        return {"upserted_count": len(vectors)}
+
+
+# Deepgram
+
+
+async def start_fake_deepgram(behaviour: Behaviour):
+    """Start the fake listen endpoint; returns (runner, url)."""
+
+    transcript = {"alternatives": [{"transcript": "I am testing the app again."}]}
+
+    async def listen(request):
+        await request.read()
+        if await behaviour.async_delay():
+            return web.json_response({"error": "simulated failure"}, status=500)
+        return web.json_response({"results": {"channels": [transcript]}})
+
+    server = web.Application()
+    server.router.add_post("/v1/listen", listen)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1/listen"
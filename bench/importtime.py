@@ -0,0 +1,49 @@
+"""Check that `import app.main` stays within an import-time budget.
+
+Runs a fresh interpreter with `-X importtime` and exits non-zero when the
+cumulative time for `app.main` is over IMPORT_BUDGET_MS.
+
+    python -m bench.importtime
+"""
+import os
+import subprocess
+import sys
+
+
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 1500))
+TOP = 15
+
+
+def measure(module="app.main"):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(result.returncode)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  <self us> | <cumulative us> | <indented name>"
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return rows
+
+
+def main():
+    rows = measure()
+    total_ms = next(c for c, _, name in rows if name == "app.main") / 1000
+    for cumulative, self_us, name in sorted(rows, reverse=True)[:TOP]:
+        print(f"{cumulative / 1000:9.1f} ms  {self_us / 1000:8.1f} ms  {name}")
+    print(f"app.main: {total_ms:.1f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    if total_ms > IMPORT_BUDGET_MS:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
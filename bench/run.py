@@ -0,0 +1,307 @@
+"""Offline benchmark for the API endpoints.
+
+Requests go straight into the ASGI app and the external services are
+replaced by the fakes in bench.fakes, so no credentials or network access are
+needed. Run from the repo root:
+
+    python -m bench.run
+    python -m bench.run --scenario text_chat --concurrency 20 --requests 400
+    python -m bench.run --latency completion=0.5 --error-rate 0.01
+    python -m bench.run --save bench/results/baseline.json
+    python -m bench.run --compare bench/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("GPT3_LOG_SAMPLE_RATE", "0")
+os.environ.setdefault("WARM_SERVICES", "false")
+
+from app import main
+from app.services import services
+from bench.fakes import (
+    Behaviour,
+    FakeIndex,
+    FakeOpenAI,
+    FakeSupabase,
+    start_fake_deepgram,
+)
+
+
+# Seconds per call for each fake service.
+DEFAULT_LATENCY = {
+    "deepgram": 0.1,
+    "embedding": 0.05,
+    "completion": 0.2,
+    "pinecone": 0.03,
+    "supabase": 0.02,
+}
+USER_ID = str(uuid.uuid4())
+AUDIO = os.urandom(32 * 1024)
+BOUNDARY = "benchboundary"
+
+
+def multipart(fields, audio):
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"'
+            f"\r\n\r\n{value}\r\n".encode()
+        )
+    parts.append(
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="audio"; '
+        f'filename="audio.wav"\r\nContent-Type: audio/wav\r\n\r\n'.encode()
+        + audio
+        + b"\r\n"
+    )
+    parts.append(f"--{BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+
+def upload(path, fields):
+    headers = [("content-type", f"multipart/form-data; boundary={BOUNDARY}")]
+    return "POST", path, "", headers, multipart(fields, AUDIO)
+
+
+def get(path, query=""):
+    return "GET", path, query, [], b""
+
+
+def post_json(path, payload):
+    headers = [("content-type", "application/json")]
+    return "POST", path, "", headers, json.dumps(payload).encode()
+
+
+SCENARIOS = {
+    "transcribe": lambda: upload("/transcribe/", {"user_id": USER_ID}),
+    "text_chat": lambda: post_json(
+        "/text_chat/",
+        {"message": "Hello, how are you?", "user_name": "bench", "user_id": USER_ID},
+    ),
+    "pinecone_chat": lambda: upload(
+        "/pinecone_chat/", {"user_id": USER_ID, "user_name": "bench"}
+    ),
+    "transcriptions": lambda: get("/transcriptions"),
+    "users": lambda: get("/users"),
+    "user_topics": lambda: get("/user_topics/", f"user_id={USER_ID}"),
+    "transcriptions_by_topic": lambda: get(
+        "/transcriptions_by_topic/", f"user_id={USER_ID}&topic=travel"
+    ),
+}
+
+
+async def asgi_request(app, method, path, query, headers, body):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(k.encode(), v.encode()) for k, v in headers]
+        + [(b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    status = {}
+    done = asyncio.Event()
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        elif message["type"] == "http.response.body" and not message.get(
+            "more_body"
+        ):
+            done.set()
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        status.setdefault("code", 500)
+    done.set()
+    return status.get("code", 500)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run_scenario(name, total, concurrency):
+    build = SCENARIOS[name]
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            code = await asgi_request(main.app, *build())
+            latencies.append(time.perf_counter() - start)
+            if code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput": total / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+async def install_fakes(latency, error_rate):
+    def behaviour(service):
+        return Behaviour(latency[service], error_rate)
+
+    supabase = FakeSupabase(behaviour("supabase"))
+    supabase.seed_user(USER_ID)
+    services.supabase = supabase
+    services.vdb = FakeIndex(behaviour("pinecone"))
+    services.openai = FakeOpenAI(behaviour("embedding"), behaviour("completion"))
+    runner, url = await start_fake_deepgram(behaviour("deepgram"))
+    main.DEEPGRAM_URL = url
+    return runner
+
+
+def print_report(results, baseline=None):
+    print(
+        f"{'scenario':26}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'errors':>8}"
+    )
+    for name, r in results.items():
+        line = (
+            f"{name:26}{r['throughput']:9.1f}{r['p50'] * 1000:10.1f}"
+            f"{r['p95'] * 1000:10.1f}{r['p99'] * 1000:10.1f}{r['errors']:8d}"
+        )
+        if baseline and baseline.get(name, {}).get("p95"):
+            before = baseline[name]["p95"]
+            line += f"   p95 {(r['p95'] - before) / before * 100:+6.1f}%"
+        print(line)
+
+
+def regressions(results, baseline, threshold):
+    found = []
+    for name, r in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        if r["p95"] > before["p95"] * (1 + threshold):
+            found.append(f"{name}: p95 {before['p95']:.4f}s -> {r['p95']:.4f}s")
+        if r["throughput"] < before["throughput"] * (1 - threshold):
+            found.append(
+                f"{name}: throughput {before['throughput']:.1f} -> "
+                f"{r['throughput']:.1f} req/s"
+            )
+    return found
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="scenario to run, repeatable (default: all)",
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        metavar="SERVICE=SECONDS",
+        help=f"fake latency override; services: {', '.join(DEFAULT_LATENCY)}",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--save", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON to diff")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="allowed relative regression before exiting non-zero",
+    )
+    return parser.parse_args(argv)
+
+
+async def run(args):
+    latency = dict(DEFAULT_LATENCY)
+    for override in args.latency:
+        service, _, seconds = override.partition("=")
+        if service not in latency:
+            raise SystemExit(f"unknown service {service!r}")
+        latency[service] = float(seconds)
+
+    runner = await install_fakes(latency, args.error_rate)
+    try:
+        results = {}
+        for name in args.scenario or list(SCENARIOS):
+            results[name] = await run_scenario(name, args.requests, args.concurrency)
+    finally:
+        await runner.cleanup()
+    return latency, results
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    latency, results = asyncio.get_event_loop().run_until_complete(run(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "latency": latency,
+                    "error_rate": args.error_rate,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if baseline:
+        found = regressions(results, baseline, args.threshold)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
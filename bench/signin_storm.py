@@ -0,0 +1,68 @@
+"""Load test: event-loop responsiveness during a burst of signins.
+
+A fake Supabase auth client takes SIGNIN_LATENCY seconds per call. While
+SIGNINS concurrent signins run, a probe task measures how late a 10 ms sleep
+wakes up, which is the delay every other request on the worker would see.
+
+    python -m bench.signin_storm
+"""
+import asyncio
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from app import auth
+from app.services import services
+
+
+SIGNINS = int(os.environ.get("SIGNINS", 200))
+SIGNIN_LATENCY = float(os.environ.get("SIGNIN_LATENCY", 0.05))
+PROBE_INTERVAL = 0.01
+
+
+class FakeAuth:
+    def sign_in_with_password(self, credentials):
+        time.sleep(SIGNIN_LATENCY)
+        return ("user", SimpleNamespace(id=credentials["email"])), None
+
+
+async def probe(stop, delays):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        delays.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def storm():
+    services.supabase = SimpleNamespace(auth=FakeAuth())
+    stop = asyncio.Event()
+    delays = []
+    probe_task = asyncio.ensure_future(probe(stop, delays))
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            auth.signin(auth.AuthRequest(email=f"user{i}@example.com", password="pw"))
+            for i in range(SIGNINS)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+
+    delays.sort()
+    print(f"signins: {SIGNINS} in {elapsed:.2f}s ({SIGNINS / elapsed:.1f}/s)")
+    print(
+        "probe delay ms: p50 %.2f  p95 %.2f  max %.2f"
+        % (
+            statistics.median(delays) * 1000,
+            delays[int(len(delays) * 0.95)] * 1000,
+            delays[-1] * 1000,
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(storm())
@@ -0,0 +1,127 @@
+import os
+from datetime import timedelta
+
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from app import auth
+
+
+@pytest.fixture(autouse=True)
+def clean_auth_state(monkeypatch):
+    auth._token_cache.clear()
+    auth._revoked_tokens.clear()
+    monkeypatch.setattr(auth, "revocation_check", None)
+    yield
+    auth._token_cache.clear()
+    auth._revoked_tokens.clear()
+
+
+def make_token(user_id="u1", expires=timedelta(hours=1)):
+    return auth.create_access_token({"sub": user_id}, expires)
+
+
+def test_verify_token_returns_principal_and_caches_it():
+    token = make_token()
+    principal = auth.verify_token(token)
+    assert principal.user_id == "u1"
+    assert auth._hash_token(token) in auth._token_cache
+    assert auth.verify_token(token) == principal
+
+
+def test_verify_token_rejects_token_without_exp():
+    token = jwt.encode({"sub": "u1"}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc:
+            auth.verify_token(token)
+        assert exc.value.status_code == 400
+    assert not auth._token_cache
+
+
+def test_verify_token_rejects_bad_signature():
+    token = jwt.encode(
+        {"sub": "u1", "exp": 9999999999}, "other-secret", algorithm=auth.ALGORITHM
+    )
+    with pytest.raises(HTTPException):
+        auth.verify_token(token)
+
+
+def test_cached_token_rejected_after_expiry():
+    token = make_token()
+    principal = auth.verify_token(token)
+    auth._token_cache[auth._hash_token(token)] = principal._replace(expires_at=0)
+    with pytest.raises(HTTPException):
+        auth.verify_token(token)
+    assert auth._hash_token(token) not in auth._token_cache
+
+
+def test_token_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(auth, "TOKEN_CACHE_SIZE", 2)
+    tokens = [make_token(f"u{i}") for i in range(3)]
+    for token in tokens:
+        auth.verify_token(token)
+    assert len(auth._token_cache) == 2
+    assert auth._hash_token(tokens[0]) not in auth._token_cache
+
+
+def test_revoke_token():
+    token = make_token()
+    auth.verify_token(token)
+    auth.revoke_token(token)
+    with pytest.raises(HTTPException):
+        auth.verify_token(token)
+
+
+def test_revocation_check_hook(monkeypatch):
+    token = make_token("blocked")
+    monkeypatch.setattr(
+        auth, "revocation_check", lambda token_hash, p: p.user_id == "blocked"
+    )
+    with pytest.raises(HTTPException):
+        auth.verify_token(token)
+    assert auth.verify_token(make_token("other")).user_id == "other"
+
+
+def test_rate_limiter_blocks_after_max_attempts():
+    limiter = auth.AccountRateLimiter(max_attempts=2, window=60)
+    limiter.check("A@example.com")
+    limiter.check("a@example.com ")
+    with pytest.raises(HTTPException) as exc:
+        limiter.check("a@example.com")
+    assert exc.value.status_code == 429
+    limiter.check("b@example.com")
+
+
+def test_rate_limiter_window_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth, "time", lambda: now[0])
+    limiter = auth.AccountRateLimiter(max_attempts=1, window=10)
+    limiter.check("a@example.com")
+    with pytest.raises(HTTPException):
+        limiter.check("a@example.com")
+    now[0] += 11
+    limiter.check("a@example.com")
+
+
+def test_rate_limiter_is_bounded_and_drops_stale_accounts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth, "time", lambda: now[0])
+    limiter = auth.AccountRateLimiter(max_attempts=5, window=10, max_accounts=3)
+    for i in range(5):
+        limiter.check(f"u{i}@example.com")
+    assert list(limiter._attempts) == [f"u{i}@example.com" for i in (2, 3, 4)]
+
+    limiter.check("u2@example.com")
+    now[0] += 5
+    limiter.check("u5@example.com")
+    assert list(limiter._attempts) == [
+        "u4@example.com",
+        "u2@example.com",
+        "u5@example.com",
+    ]
+    now[0] += 6
+    limiter.check("u6@example.com")
+    assert list(limiter._attempts) == ["u5@example.com", "u6@example.com"]
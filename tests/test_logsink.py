@@ -0,0 +1,58 @@
+import gzip
+import json
+import os
+
+from app import metrics
+from app.logsink import CompletionLogSink
+
+
+def read_segments(directory):
+    names = sorted(os.listdir(directory))
+    records = []
+    for name in names:
+        with gzip.open(os.path.join(directory, name), "rt") as f:
+            records.extend(json.loads(line) for line in f)
+    return names, records
+
+
+def test_stop_drains_queued_records(tmp_path):
+    sink = CompletionLogSink(directory=str(tmp_path), batch_size=5, flush_interval=60)
+    for i in range(23):
+        sink.log({"n": i})
+    sink.stop()
+    _, records = read_segments(tmp_path)
+    assert [r["n"] for r in records] == list(range(23))
+
+
+def test_segments_rotate_and_are_pruned(tmp_path):
+    sink = CompletionLogSink(
+        directory=str(tmp_path), batch_size=1, segment_bytes=1, max_segments=3
+    )
+    for i in range(10):
+        sink._write_batch([{"n": i}])
+    names, records = read_segments(tmp_path)
+    # One batch per segment; only the newest three survive.
+    assert len(names) == 3
+    assert [r["n"] for r in records] == [7, 8, 9]
+
+
+def test_segments_rotate_at_segment_bytes(tmp_path):
+    sink = CompletionLogSink(directory=str(tmp_path), segment_bytes=200)
+    for i in range(20):
+        sink._write_batch([{"n": i}])
+    names, records = read_segments(tmp_path)
+    assert len(names) > 1
+    assert [r["n"] for r in records] == list(range(20))
+    for name in names[:-1]:
+        assert os.path.getsize(os.path.join(tmp_path, name)) >= 200
+
+
+def test_full_queue_drops_and_counts(tmp_path, monkeypatch):
+    sink = CompletionLogSink(directory=str(tmp_path), queue_size=1)
+    monkeypatch.setattr(sink, "start", lambda: None)
+    before = metrics.gpt3_log_dropped._value
+    for i in range(3):
+        sink.log({"n": i})
+    assert sink.dropped == 2
+    assert metrics.gpt3_log_dropped._value == before + 2
+    assert "gpt3_log_dropped_total" in metrics.render_metrics()
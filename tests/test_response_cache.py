@@ -0,0 +1,92 @@
+from array import array
+
+import pytest
+
+from app import utils
+from app.response_cache import ResponseCache
+
+
+def test_exact_hit_is_scoped_and_keyed_on_params():
+    cache = ResponseCache()
+    cache.put("u1", "prompt", {"temp": 0.0}, "answer")
+    assert cache.get("u1", "prompt", {"temp": 0.0}) == "answer"
+    assert cache.get("u2", "prompt", {"temp": 0.0}) is None
+    assert cache.get("u1", "prompt", {"temp": 0.0, "tokens": 10}) is None
+
+
+def test_exact_entries_expire_and_are_lru_bounded():
+    cache = ResponseCache(max_size=2)
+    for prompt in ("a", "b", "c"):
+        cache.put("u1", prompt, {}, prompt.upper())
+    assert cache.get("u1", "a", {}) is None
+    assert cache.get("u1", "c", {}) == "C"
+
+    expired = ResponseCache(ttl=-1)
+    expired.put("u1", "a", {}, "A")
+    assert expired.get("u1", "a", {}) is None
+
+
+def test_near_duplicate_hit_within_scope_only():
+    cache = ResponseCache(similarity=0.99)
+    cache.put(("u1", "Diomedes"), "p1", {}, "hello", [1.0, 0.0, 0.0])
+    assert cache.get(("u1", "Diomedes"), "p2", {}, [0.999, 0.01, 0.0]) == "hello"
+    assert cache.get(("u1", "Diomedes"), "p2", {}, [0.0, 1.0, 0.0]) is None
+    assert cache.get(("u1", "Raven"), "p2", {}, [1.0, 0.0, 0.0]) is None
+
+
+def test_similarity_store_is_bounded_in_total_and_compact():
+    cache = ResponseCache(similarity=0.9, max_similar=3, max_per_user=2)
+    for user in range(4):
+        cache.put(f"u{user}", "p", {}, "r", [1.0, float(user)])
+    assert len(cache._similar) == 3
+    assert all(isinstance(e.vector, array) for e in cache._similar.values())
+
+    for i in range(3):
+        cache.put("u9", f"p{i}", {}, "r", [1.0, 0.0])
+    assert len(cache._by_scope["u9"]) == 2
+
+
+def test_zero_per_user_disables_similarity_store():
+    cache = ResponseCache(similarity=0.9, max_per_user=0)
+    cache.put("u1", "p", {}, "r", [1.0, 0.0])
+    assert not cache._similar
+    assert cache.get("u1", "other", {}, [1.0, 0.0]) is None
+
+
+def test_clear_user_drops_all_their_scopes():
+    cache = ResponseCache(similarity=0.9)
+    cache.put(("u1", "a"), "p", {}, "r", [1.0])
+    cache.put(("u1", "b"), "p", {}, "r", [1.0])
+    cache.put(("u2", "a"), "p", {}, "r", [1.0])
+    cache.clear("u1")
+    assert cache.get(("u1", "a"), "p", {}) is None
+    assert list(cache._by_scope) == [("u2", "a")]
+    assert cache.get(("u2", "a"), "p", {}) == "r"
+
+
+@pytest.fixture
+def fake_completion(monkeypatch):
+    calls = []
+
+    def gpt3_completion(prompt, engine="text-davinci-003", temp=0.0, tokens=400):
+        calls.append((prompt, engine, temp, tokens))
+        return f"reply {len(calls)}"
+
+    monkeypatch.setattr(utils, "gpt3_completion", gpt3_completion)
+    monkeypatch.setattr(utils, "response_cache", ResponseCache())
+    return calls
+
+
+def test_cached_completion_keys_on_effective_params(fake_completion):
+    assert utils.cached_gpt3_completion("p", "u1") == "reply 1"
+    assert utils.cached_gpt3_completion("p", "u1", tokens=400) == "reply 1"
+    assert utils.cached_gpt3_completion("p", "u1", tokens=100) == "reply 2"
+    assert utils.cached_gpt3_completion("p", "u1", engine="other") == "reply 3"
+    assert len(fake_completion) == 3
+
+
+def test_cached_completion_skips_nonzero_temperature(fake_completion):
+    utils.cached_gpt3_completion("p", "u1", temp=0.7)
+    utils.cached_gpt3_completion("p", "u1", temp=0.7)
+    assert len(fake_completion) == 2
+    assert not utils.response_cache._exact
@@ -0,0 +1,40 @@
+import asyncio
+
+from app import services as services_module
+from app.services import Services
+
+
+def test_warm_up_retries_with_backoff_until_ready(monkeypatch):
+    services = Services()
+    attempts = []
+
+    def warm_up():
+        attempts.append(1)
+        if len(attempts) == 3:
+            services.supabase = services.vdb = services.openai = object()
+        return services.is_ready()
+
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(services, "warm_up", warm_up)
+    monkeypatch.setattr(services_module.asyncio, "sleep", sleep)
+    asyncio.run(services.warm_up_until_ready(delay=1.0, max_delay=1.5))
+    assert len(attempts) == 3
+    assert delays == [1.0, 1.5]
+    assert services.is_ready()
+
+
+class PineconeDown(Services):
+    @property
+    def vdb(self):
+        raise RuntimeError("pinecone down")
+
+
+def test_warm_up_records_error_and_reports_not_ready():
+    services = PineconeDown()
+    services.supabase = services.openai = object()
+    assert services.warm_up() is False
+    assert services.warm_error == "pinecone down"
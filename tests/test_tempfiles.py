@@ -0,0 +1,78 @@
+import io
+import os
+from time import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import tempfiles
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def upload(data=b"audio"):
+    return SimpleNamespace(file=io.BytesIO(data))
+
+
+def write_file(path, size=10, age=0):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    mtime = time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def test_request_audio_file_writes_upload_and_removes_it_on_exit():
+    with tempfiles.request_audio_file(upload(b"hello")) as (file_id, location):
+        with open(location, "rb") as f:
+            assert f.read() == b"hello"
+        assert file_id in location
+    assert not os.path.exists(location)
+    assert not tempfiles._live_paths
+
+
+def test_request_audio_file_removes_file_when_request_fails():
+    with pytest.raises(RuntimeError):
+        with tempfiles.request_audio_file(upload()) as (_, location):
+            raise RuntimeError
+    assert not os.path.exists(location)
+    assert not tempfiles._live_paths
+
+
+def test_sweep_skips_in_flight_file_under_age_quota():
+    with tempfiles.request_audio_file(upload()) as (_, location):
+        os.utime(location, (time() - 100, time() - 100))
+        removed = tempfiles.sweep_directory(tempfiles.AUDIO_DIR, max_age=10)
+        assert removed == 0
+        assert os.path.exists(location)
+
+
+def test_sweep_skips_in_flight_file_under_size_quota():
+    stale = os.path.join(tempfiles.AUDIO_DIR, "older.wav")
+    with tempfiles.request_audio_file(upload(b"y" * 100)) as (_, location):
+        # Older than the live file, so an oldest-first trim would pick it
+        # first, then the live one.
+        write_file(stale, size=100, age=5)
+        os.utime(location, (time() - 50, time() - 50))
+        removed = tempfiles.sweep_directory(
+            tempfiles.AUDIO_DIR, max_age=3600, max_bytes=10
+        )
+        assert removed == 1
+        assert os.path.exists(location)
+        assert not os.path.exists(stale)
+
+
+def test_sweep_removes_stale_files_and_trims_oldest_first():
+    os.makedirs("logs")
+    write_file("logs/ancient", age=1000)
+    write_file("logs/old", size=100, age=50)
+    write_file("logs/new", size=100, age=1)
+    removed = tempfiles.sweep_directory("logs", max_age=500, max_bytes=150)
+    assert removed == 2
+    assert os.listdir("logs") == ["new"]
+
+
+def test_sweep_missing_directory():
+    assert tempfiles.sweep_directory("does-not-exist") == 0